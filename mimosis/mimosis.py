@@ -23,21 +23,40 @@
 # Oliver Keller GSI/FAIR | 2022 | o.keller ÄT gsi.de
 # BSD License
 
-from sys import stdout
+from sys import stdout, version_info
 import random, binascii, time
 import asyncio
+import concurrent.futures
+import functools, inspect
+
+# ADD_MSB, ADD_LSB start addresses of general configuration and DAC registers
+GENCONF_ADDR = (0b0000_0000, 0b0010_0000)
+DAC_ADDR     = (0b0000_0000, 0b0100_0000)
+
+# number of bits set to 1 in a (large) integer
+if version_info >= (3,10):
+    _popcount = int.bit_count
+else:
+    def _popcount(n):
+        return bin(n).count("1")
     
 class Msis1: 
     
     DEBUG = False # enable for printing out individual read/write I2C transactions
+    MIN_SLEEP = 500e-6 # in runBitFlipSearch(), shorter waiting times only yield to other co-routines until due
 
-    def __init__(self, sim=False, chipid=1,fread=None, fwrite=None, beamControl=False):
+    def __init__(self, sim=False, chipid=1,fread=None, fwrite=None, beamControl=False, fblockread=None, fblockwrite=None, fwrread=None, simBlock=True):
         # sim = enable simulation mode, no hardware required (fread/fwrite will not be used)
         # chipid = specifiy Mimosis-1 chip id
         # fread = specify I2C read function
         # fwrite = specify I2C write function
         # beamControl = optionally enable
+        # fblockread = optional I2C block read function(addr, length), e.g. via smbus2 i2c_rdwr
+        # fblockwrite = optional I2C block write function(addr, buf), e.g. via smbus2 i2c_rdwr
+        # fwrread = optional combined I2C write-then-read function(cmds, length), e.g. via smbus2 i2c_rdwr
+        # simBlock = in simulation mode, set to False for single byte access only (like plain fread/fwrite)
         self.chipid = chipid
+        simBlock = sim is True and simBlock is True
 
         if fwrite is not None:
            self.chipwrite = fwrite
@@ -50,11 +69,26 @@ class Msis1:
         else:
             if sim is True:
                 self.chipread = self.readSim
+
+        # block access streams several bytes per I2C transaction using the
+        # auto-incrementing RD_IND/WR_IND commands, falls back to single bytes if None
+        self.chipblockread = fblockread
+        if fblockread is None and simBlock:
+            self.chipblockread = self.readSimBlock
+
+        self.chipblockwrite = fblockwrite
+        if fblockwrite is None and simBlock:
+            self.chipblockwrite = self.writeSimBlock
+
+        # combined write(s) + read with repeated start, saves a transaction per read
+        self.chipwrread = fwrread
+        if fwrread is None and simBlock:
+            self.chipwrread = self.writeReadSim
         
         self.conf = {}
         
         # GenConf and DAC values based on Msis1_no_pll_gilles.bin from 12.03.2021
-        self.GenConf = {'RUNMODE'   : 0x40, # enable CLKRESCUE pad termination
+        self.GenConf = RegisterDict({'RUNMODE'   : 0x40, # enable CLKRESCUE pad termination
                         'TRIMDAC'   : 0x6E, # reset default
                         'INJCURR'   : 0x00, # reset default
                         'INJVOLT1'  : 0x00, # reset default
@@ -70,8 +104,8 @@ class Msis1:
                         'SLVSRX'    : 0x00, # !very low input bias for CLK & CLKRESCUE pads! (from Gille's config, boderline but OK according to Fred)
                         'OUTPUT'    : 0x17, # !enable all 8 outputs and data marker!
                         'MONPWR'    : 0x00, # reset default
-        }
-        self.DAC =    { 'IBIAS'     : 64,
+        })
+        self.DAC = RegisterDict({ 'IBIAS'     : 64,
                         'ITHR'      : 52,
                         'IDB'       : 28,
                         'VRESET'    : 171,
@@ -86,33 +120,30 @@ class Msis1:
                         'VCASN2'    : 83,
                         'VCLIP'     : 50,
                         'IBUFBIAS'  : 125
-        }
+        })
         
         self.beamControl = beamControl
         self.confLoaded = False
         self.bitFlipFound = False
         self.bitFlipResult = []
         self.simReadFlip = False
+        self._last_addr_msb = None # last value written to ADD_MSB, None if unknown
         self.lastRead = bytearray(16)
         
-        self.bitcounts = bytes(bin(x).count("1") for x in range(256)) #look-up table for number of 1-bits in a byte
-       
-        
-        
         if sim is True:
             # all bits zero, which is not the default chip config in reality!
-            self.simRegs = []
-            for i in range(256):
-                self.simRegs.append([])
-                for j in range(256):
-                    self.simRegs[i].append([0x00,0x00])
+            # 256 x 256 registers of 2 bytes each, register at (msb<<9)|(lsb<<1)
+            self.simRegs = bytearray(256*256*2)
         
 
         cmdIds = enumerate( ['INSTR','ADD_MSB','ADD_LSB','WR','RD','WR_IND','RD_IND','WR_OFF','RD_OFF'], start=1) 
         self.CMDID = dict((j,i) for i,j in cmdIds)
+        # pre-computed I2C address bytes, e.g. self._cmd_add_lsb, same as getCmdByte("ADD_LSB")
+        for k,v in self.CMDID.items():
+            setattr(self, '_cmd_'+k.lower(), (0b111 & self.chipid) << 4 | (0b1111 & v))
 
-        self.ADDRS = {"GenConf"  : [0b0000_0000,0b0010_0000],
-                      "DAC"      : [0b0000_0000,0b0100_0000],
+        self.ADDRS = {"GenConf"  : list(GENCONF_ADDR),
+                      "DAC"      : list(DAC_ADDR),
                       "SeqConf"  : [0b0000_0000,0b0110_0000],
                       "PixCtrl"  : [0b0000_0000,0b1000_0000],
                       "Mon"      : [0b0000_0000,0b1110_0000],
@@ -121,6 +152,12 @@ class Msis1:
                       "RoTstConf": [0b1000_0000,0b0100_0000],
         }
 
+        # with beamControl, blocking I2C access in runBitFlipSearch() runs in a single worker 
+        # thread, so reading scan positions from tcpSocket is not blocked meanwhile
+        self._io_executor = None
+        if self.beamControl is True:
+            self._io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
         self.tcpSocket=MicrobeamSubscriberSocket()
         if self.beamControl is False:
             # bogus defaults for the log file
@@ -131,16 +168,114 @@ class Msis1:
         
     def write(self, addr, *args):
         # only single byte writing for now: address byte + 1 payload byte in args
+        if addr == self._cmd_add_msb:
+            # keep track of ADD_MSB, unknown if the write fails
+            self._last_addr_msb = None
+            result = self.chipwrite(addr, *args)
+            self._last_addr_msb = args[0]
+            return result
         return self.chipwrite(addr, *args)
+
+    def setAddrMSB(self, msb):
+        # write ADD_MSB only if it differs from the value sent by the previous write access,
+        # saves a whole I2C transaction for back-to-back writes like in updateRegs()
+        # reads always send ADD_MSB and forget the tracked value, so an upset of the chip's
+        # ADD_MSB register is healed by the next read instead of showing up as a data bit-flip
+        if msb != self._last_addr_msb:
+            self.write(self._cmd_add_msb, msb)
+
+    def resetAddrMSB(self):
+        # forget the last value written to ADD_MSB, so it is sent again with the next access
+        # call after chip reset or power cycle
+        self._last_addr_msb = None
     
     def read(self, addr, *args):
         # only single byte reading for now, args unused
         result = self.chipread(addr, *args)
         if self.simReadFlip is True:
-            if random.randint(0,999) == 0:
-                #flip a random bit with 0.1% chance
-                rbit = (result << random.randint(0,7)) & 0x80 # select bit
-                result = result ^ rbit # flip it!
+            result = self.simFlip(result)
+        return result
+
+    def blockWrite(self, addr, buf):
+        # write all bytes of buf in one I2C transaction, chip increments ADD_LSB
+        return self.chipblockwrite(addr, buf)
+
+    def blockRead(self, addr, length):
+        # read length bytes in one I2C transaction, chip increments ADD_LSB
+        result = self.chipblockread(addr, length)
+        if self.simReadFlip is True:
+            # mutable copy only needed for simulated flips
+            result = bytearray(result)
+            for i in range(length):
+                result[i] = self.simFlip(result[i])
+        return result
+
+    def writeRead(self, cmds, length):
+        # cmds = [addr, byte, addr, byte, ..., read addr]
+        # writes all address/byte pairs, then reads length bytes from last addr
+        # in one I2C transaction (repeated start)
+        result = self.chipwrread(cmds, length)
+        if self.simReadFlip is True:
+            result = bytearray(result)
+            for i in range(length):
+                result[i] = self.simFlip(result[i])
+        return result
+
+    def readRange(self, lsb, length, msb=None, into=None):
+        # read length consecutive registers starting at ADD_LSB=lsb
+        # ADD_MSB is set before if msb is given, otherwise it must be set already
+        # into = optional buffer (e.g. a memoryview slice) filled in place from its start,
+        # a new bytearray if None, returns the filled buffer
+        # uses the fewest I2C transactions the backend supports
+        if into is None:
+            into = bytearray(length)
+        if self.chipwrread is not None:
+            if msb is None:
+                into[:length] = self.writeRead([self._cmd_add_lsb, lsb, self._cmd_rd_ind], length)
+                return into
+            # complete address setup and burst read pipelined in one transaction,
+            # ADD_MSB is always sent for reads, see setAddrMSB()
+            self.resetAddrMSB()
+            into[:length] = self.writeRead([self._cmd_add_msb, msb, self._cmd_add_lsb, lsb, self._cmd_rd_ind], length)
+            return into
+        if msb is not None:
+            # always sent for reads, see setAddrMSB()
+            self.write(self._cmd_add_msb, msb)
+            self.resetAddrMSB()
+        if self.chipblockread is not None:
+            self.write(self._cmd_add_lsb, lsb)
+            into[:length] = self.blockRead(self._cmd_rd_ind, length)
+            return into
+        # single bytes: call I2C functions via locals, write() is not needed 
+        # as ADD_MSB is not touched and read() only adds simulated flips
+        w = self.chipwrite
+        r = self.read if self.simReadFlip is True else self.chipread
+        addLSB, rd = self._cmd_add_lsb, self._cmd_rd
+        for i in range(length):
+            w(addLSB, lsb + i)
+            into[i] = r(rd)
+        return into
+
+    def writeRange(self, lsb, buf, msb=None):
+        # write buf into consecutive registers starting at ADD_LSB=lsb
+        # ADD_MSB is set before if msb is given, otherwise it must be set already
+        if msb is not None:
+            self.setAddrMSB(msb)
+        if self.chipblockwrite is not None:
+            self.write(self._cmd_add_lsb, lsb)
+            return self.blockWrite(self._cmd_wr_ind, buf)
+        w = self.chipwrite
+        addLSB, wr = self._cmd_add_lsb, self._cmd_wr
+        for i in range(len(buf)):
+            w(addLSB, lsb + i)
+            w(wr, buf[i])
+        return len(buf)
+
+    def simFlip(self, result):
+        if random.getrandbits(10) == 0:
+            #flip a random bit with ~0.1% (1/1024) chance
+            rbit = 1 << random.getrandbits(3) # select bit
+            result = result ^ rbit # flip it!
         return result
                 
     def writeSim(self, addr, *args):
@@ -150,23 +285,24 @@ class Msis1:
                 print(hex(i), end=' ')
             print()
             
-        if addr == self.getCmdByte("ADD_LSB") and len(args)==1:
+        if addr == self._cmd_add_lsb and len(args)==1:
             self.simAddrLSB = args[0]
-        elif addr == self.getCmdByte("ADD_MSB") and len(args)==1:
+        elif addr == self._cmd_add_msb and len(args)==1:
             self.simAddrMSB = args[0]            
-        elif addr == self.getCmdByte("WR"):
-             self.simRegs[self.simAddrMSB][self.simAddrLSB]=args
+        elif addr == self._cmd_wr:
+            idx = (self.simAddrMSB<<9) | (self.simAddrLSB<<1)
+            payload = bytes(args[:2])
+            self.simRegs[idx:idx+len(payload)] = payload
         return len(args)
 
     def readSim(self, addr, *args):
-        try:
-            length=len(*args)
-        except:
-            length=1
+        # optional args[0]: buffer to determine number of bytes to read
+        length = len(args[0]) if args and hasattr(args[0], '__len__') else 1
         if self.DEBUG:
             print(">  read ", hex(addr), ":", length, "byte(s)" )
-        if addr == self.getCmdByte("RD"):
-            reg=self.simRegs[self.simAddrMSB][self.simAddrLSB]
+        if addr == self._cmd_rd:
+            idx = (self.simAddrMSB<<9) | (self.simAddrLSB<<1)
+            reg=self.simRegs[idx:idx+2]
             if self.DEBUG:
                 print(">> ", end="")
                 for i in range(length):
@@ -179,6 +315,55 @@ class Msis1:
         else:
             print("address mismatch!")
             return len(args)
+
+    def writeSimBlock(self, addr, buf):
+        if self.DEBUG:
+            print("< write ", hex(addr), ": ", end='');
+            for i in buf:
+                print(hex(i), end=' ')
+            print()
+
+        if addr == self._cmd_wr_ind:
+            if self.simAddrLSB + len(buf) <= 256:
+                # low bytes of consecutive registers are every 2nd byte in simRegs
+                idx = (self.simAddrMSB<<9) | (self.simAddrLSB<<1)
+                self.simRegs[idx:idx + 2*len(buf):2] = buf
+                self.simAddrLSB = (self.simAddrLSB + len(buf)) & 0xff
+            else:
+                for byte in buf:
+                    self.simRegs[(self.simAddrMSB<<9) | (self.simAddrLSB<<1)] = byte
+                    self.simAddrLSB = (self.simAddrLSB + 1) & 0xff
+        return len(buf)
+
+    def readSimBlock(self, addr, length):
+        if self.DEBUG:
+            print(">  read ", hex(addr), ":", length, "byte(s)" )
+        if addr == self._cmd_rd_ind:
+            if self.simAddrLSB + length <= 256:
+                idx = (self.simAddrMSB<<9) | (self.simAddrLSB<<1)
+                result = self.simRegs[idx:idx + 2*length:2]
+                self.simAddrLSB = (self.simAddrLSB + length) & 0xff
+            else:
+                result = bytearray(length)
+                for i in range(length):
+                    result[i] = self.simRegs[(self.simAddrMSB<<9) | (self.simAddrLSB<<1)]
+                    self.simAddrLSB = (self.simAddrLSB + 1) & 0xff
+            if self.DEBUG:
+                print(">> ", end="")
+                for i in result:
+                    print(hex(i), end=" ")
+                print()
+            return result
+        else:
+            print("address mismatch!")
+            return bytearray(length)
+
+    def writeReadSim(self, cmds, length):
+        for i in range(0, len(cmds) - 1, 2):
+            self.writeSim(cmds[i], cmds[i+1])
+        if cmds[-1] == self._cmd_rd_ind:
+            return self.readSimBlock(cmds[-1], length)
+        return bytes([self.readSim(cmds[-1])])
     
     def getCmdByte(self, cmdId):
         # assemble I2C address byte from chip id and command id
@@ -194,6 +379,15 @@ class Msis1:
         for i, value in enumerate(d.values()):
             ba[i]=value
         return ba
+
+    def getRegBytes(self, d):
+        # like getBytesFromDict(), but re-uses the byte array of a RegisterDict
+        # as long as none of its values were changed
+        if not isinstance(d, RegisterDict):
+            return self.getBytesFromDict(d)
+        if d.bytes is None:
+            d.bytes = self.getBytesFromDict(d)
+        return d.bytes
    
     def rwReg16w(self, type, buf, mode='r'):
         # can be used for GeneralConf, DAC & Monitoring registers
@@ -215,45 +409,75 @@ class Msis1:
             print("! buf too small" )
             return False
                   
-        writeByte=self.ADDRS[type][0]
-        self.write(int(self.getCmdByte("ADD_MSB")), writeByte)
-
-        for i in range(len(buf)):
-            writeByte=(self.ADDRS[type][1] & 0b1111_0000) | i
-            self.write(self.getCmdByte("ADD_LSB"), writeByte)
-            if mode == 'r':
-                buf[i] = self.read(self.getCmdByte("RD"))
-            else:
-                writeByte=buf[i]
-                self.write(self.getCmdByte("WR"),writeByte)
+        msb=self.ADDRS[type][0]
+        lsb=self.ADDRS[type][1] & 0b1111_0000
+        if mode == 'r':
+            self.readRange(lsb, len(buf), msb, buf)
+        else:
+            self.writeRange(lsb, buf, msb)
         return len(buf)
         
-    def readGenConf(self):
-        readBytes = bytearray(16)
-        self.rwReg16w("GenConf", readBytes, 'r')
+    def getReadBuffer(self, length, out=None):
+        # buffer for the read*() methods: a new bytearray, or the given out buffer 
+        # to read into in place (a memoryview of the first length bytes if larger)
+        # returns None if out is too small
+        if out is None:
+            return bytearray(length)
+        if len(out) < length:
+            print("! buf too small" )
+            return None
+        if len(out) == length:
+            return out
+        return memoryview(out)[:length]
+
+    # rwReg16w() specialized for GenConf/DAC without type, mode and size checks,
+    # used by the read/write wrappers below for their known-good buffers
+    def _readGenConf(self, buf):
+        self.readRange(GENCONF_ADDR[1], 16, GENCONF_ADDR[0], buf)
+        return 16
+
+    def _writeGenConf(self, buf):
+        return self.writeRange(GENCONF_ADDR[1], buf, GENCONF_ADDR[0])
+
+    def _readDAC(self, buf):
+        self.readRange(DAC_ADDR[1], 15, DAC_ADDR[0], buf)
+        return 15
+
+    def _writeDAC(self, buf):
+        return self.writeRange(DAC_ADDR[1], buf, DAC_ADDR[0])
+
+    def readGenConf(self, out=None):
+        readBytes = self.getReadBuffer(16, out)
+        if readBytes is None:
+            return False
+        self._readGenConf(readBytes)
         self.lastRead = readBytes
         return readBytes
 
-    def readDAC(self):
-        readBytes = bytearray(15)
-        self.rwReg16w("DAC", readBytes, 'r')
+    def readDAC(self, out=None):
+        readBytes = self.getReadBuffer(15, out)
+        if readBytes is None:
+            return False
+        self._readDAC(readBytes)
         self.lastRead = readBytes
         return readBytes
 
-    def readMon(self):
-        readBytes = bytearray(15)
+    def readMon(self, out=None):
+        readBytes = self.getReadBuffer(15, out)
+        if readBytes is None:
+            return False
         self.rwReg16w("DAC", readBytes, 'r')
         self.lastRead = readBytes
         return readBytes
 
     def writeGenConf(self, writeBytes=None):
         if writeBytes is None:
-            writeBytes = self.getBytesFromDict(self.GenConf)
+            return self._writeGenConf(self.getRegBytes(self.GenConf))
         return self.rwReg16w("GenConf",writeBytes, 'w')
 
     def writeDAC(self, writeBytes=None):
         if writeBytes is None:
-            writeBytes = self.getBytesFromDict(self.DAC)
+            return self._writeDAC(self.getRegBytes(self.DAC))
         return self.rwReg16w("DAC",writeBytes, 'w')
 
     def writeMon(self, writeBytes=None):
@@ -266,37 +490,35 @@ class Msis1:
             print("! only broadcast mode supported")
          
         writeByte=0b0100_0000 #BCAS = 1, region addr = 0
-        self.write(self.getCmdByte("ADD_MSB"), writeByte)
+        self.write(self._cmd_add_msb, writeByte)
 
         writeByte=(self.ADDRS["PixCtrl"][1] & 0b1110_0000) | (mask & 0b1_1111)
-        self.write(self.getCmdByte("ADD_LSB"), writeByte)
+        self.write(self._cmd_add_lsb, writeByte)
         if mode == 'r':
-            value = self.pread(self.getCmdByte("RD"))
+            value = self.pread(self._cmd_rd)
             return value
         else:
             writeByte=value
-            self.write(self.getCmdByte("WR"),writeByte)
+            self.write(self._cmd_wr,writeByte)
             return 1
        
     def rwRoTstConf(self, buf, mode='r'):
         # access Readout Test Configuration register
-        writeByte=self.ADDRS["RoTstConf"][0]  #0x80
-        self.write(self.getCmdByte("ADD_MSB"), writeByte)
-        
+        msb=self.ADDRS["RoTstConf"][0]  #0x80
         offset=0x40
-        for i in range(20):
-            writeByte=offset
-            self.write(self.getCmdByte("ADD_LSB"), writeByte)
-            if mode == 'r':
-                buf[i] = self.read(self.getCmdByte("RD"))
-            else:
-                writeByte=buf[i]
-                self.write(self.getCmdByte("WR"),writeByte)
-            offset += 1
+        if len(buf) < 20:
+            print("! buf too small" )
+            return False
+        if mode == 'r':
+            self.readRange(offset, 20, msb, buf)
+        else:
+            self.writeRange(offset, buf[:20], msb)
         return len(buf)
     
-    def readRoTstConf(self):
-        readBytes = bytearray(20)
+    def readRoTstConf(self, out=None):
+        readBytes = self.getReadBuffer(20, out)
+        if readBytes is None:
+            return False
         self.rwRoTstConf(readBytes, 'r')
         return readBytes
         
@@ -306,8 +528,10 @@ class Msis1:
         self.rwRoTstConf(writeBytes, 'w')
         return writeBytes
 
-    def readMFE(self):
-        readBytes = bytearray(64*8)
+    def readMFE(self, out=None):
+        readBytes = self.getReadBuffer(64*8, out)
+        if readBytes is None:
+            return False
         self.rwMFE(readBytes, 'r')
         return readBytes
         
@@ -320,23 +544,21 @@ class Msis1:
     def rwMFE(self, buf, mode='r'):
         # access MultiFrameEmulation memory cells (SRAM)
         # FIXME: high byte is missing
-        writeByte=0
+        # frames 0..7 of a region are consecutive ADD_LSB addresses,
+        # so each region is one burst with its ADD_MSB setup pipelined in front
+        lsb=self.ADDRS["MFE"][1] & 0b1111_1000
+        view = memoryview(buf) # slices of it are filled in place by readRange()
         for region in range(64):
-            writeByte=(self.ADDRS["MFE"][0] & 0b1000_0000) | (region & 0b11_1111)
-            self.write(self.getCmdByte("ADD_MSB"), writeByte)
-            for frame in range(8):
-                writeByte=(self.ADDRS["MFE"][1] & 0b1111_1000) | (frame & 0b111)
-                self.write(self.getCmdByte("ADD_LSB"), writeByte)
-                if mode == 'r':
-                    buf[region*8 + frame] = self.read(self.getCmdByte("RD"))
-                else:
-                    writeByte=buf[region*8 + frame]
-                    self.write(self.getCmdByte("WR"),writeByte)
+            msb=(self.ADDRS["MFE"][0] & 0b1000_0000) | (region & 0b11_1111)
+            if mode == 'r':
+                self.readRange(lsb, 8, msb, view[region*8:region*8 + 8])
+            else:
+                self.writeRange(lsb, buf[region*8:region*8 + 8], msb)
         return len(buf)    
 
     def runBitFlipSearch(self, interval, function, update=None,simReadFlip=False):
         # Starts continous register read loop as asyncio co-routine (~lightweight thread)
-        # interval = waiting time between consecutive reads in seconds as float number
+        # interval = time between the starts of consecutive reads in seconds as float number
         # function = desired read function for continous regsister checking
         # update = optional list/array of functions for re-writing known register settings after bit-flip
         # simReadFlip = if True, introduce fake bit flips for testing purposes!
@@ -364,53 +586,97 @@ class Msis1:
             if self.DEBUG is True:
                 print('tcpSocket msg:', msg)
   
+    async def __runIO(self, function):
+        # call blocking I2C read/write function, in worker thread if available
+        if self._io_executor is None:
+            return function()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._io_executor, function)
+
     async def __checkBitFlipLoop(self, function, interval, update):
-        self.lastRead = function()
-        reference = self.lastRead
+        self.lastRead = await self.__runIO(function)
+        # own bytearray copy: stays valid if function re-uses its buffer and
+        # reference != lastRead is a plain memory comparison without boxing single bytes
+        reference = bytearray(self.lastRead)
+        # reference is never replaced: after a bit-flip the update functions
+        # re-write the known settings, so the first read stays the expectation
+        onesInReference=self.onesInBytes(reference)
+
+        # if supported, read into the same buffer every time instead of allocating new ones
+        read = function
+        try:
+            params = inspect.signature(function).parameters
+        except (ValueError, TypeError):
+            # no signature available, e.g. for some builtins
+            params = {}
+        if 'out' in params:
+            read = functools.partial(function, out=bytearray(len(reference)))
         
+        # names used in the loop are resolved once as locals,
+        # the rare bit-flip case is handled in __processBitFlip()
+        loop = asyncio.get_event_loop()
+        executor = self._io_executor
+        sleep = asyncio.sleep
+        perf_counter = time.perf_counter
+        minSleep = self.MIN_SLEEP
         counter = 0
         while True:
             #print(".",end='')
-            self.lastRead = function() 
-            onesInReference=self.onesInBytes(reference)
+            deadline = perf_counter() + interval
+            if executor is None:
+                lastRead = read()
+            else:
+                lastRead = await loop.run_in_executor(executor, read)
+            self.lastRead = lastRead
             counter +=1
-            for i in range(len(self.lastRead)):
-                if reference[i] != self.lastRead[i]:
-                    tstamp=self.tstr(time.localtime())
-                    self.bitFlipFound=True
-                    self.bitFlipResult=[reference, self.lastRead]
-                    print(tstamp,"\t", counter, "\t", 
-                          str(function.__name__), '\t', 
-                          onesInReference , "\told\t", 
-                          self.tcpSocket.scanId, ':', self.tcpSocket.scan_x, ':', self.tcpSocket.scan_y, "\t", sep='', end="")
-                    self.baprint(reference)
-                    
-                    print(tstamp, "\t", counter,"\t", 
-                          str(function.__name__), '\t', 
-                          self.onesInBytes(self.lastRead) , "\t",
-                          "new","\t", 
-                          self.tcpSocket.scanId, ':', self.tcpSocket.scan_x, ':', self.tcpSocket.scan_y, "\t", sep='', end="")
-                    self.baprint(self.lastRead)
-                    stdout.flush()
-                    if update is not None:
-                        for u in update:
-                            u()
-                            if self.DEBUG is True:
-                                print("! updating at", counter, u, )
-                    else:
-                        return
-                    break
-              
-            await asyncio.sleep(interval)
+            if reference != lastRead:
+                if not await self.__processBitFlip(function, reference, lastRead, onesInReference, counter, update):
+                    return
+            # wait for the remaining time until deadline, shorter waits than
+            # minSleep only yield to the event loop until the deadline has passed
+            slack = deadline - perf_counter()
+            if slack > minSleep:
+                await sleep(slack)
+            else:
+                await sleep(0)
+                while perf_counter() < deadline:
+                    await sleep(0)
+
+    async def __processBitFlip(self, function, reference, lastRead, onesInReference, counter, update):
+        # report bit-flip and re-write registers, returns False if search should stop
+        # number of flipped bits between reference and last read
+        flips = _popcount(int.from_bytes(reference,'big') ^ int.from_bytes(lastRead,'big'))
+        tstamp=self.tstr(time.localtime())
+        self.bitFlipFound=True
+        self.bitFlipResult=[reference, bytearray(lastRead)] # copy, read buffer is re-used
+        # the chip's ADD_MSB register might be affected as well
+        self.resetAddrMSB()
+        # old and new line in a single write, number of flipped bits appended as last column
+        tcp = self.tcpSocket
+        sid, sx, sy, name = tcp.scanId, tcp.scan_x, tcp.scan_y, getattr(function, '__name__', repr(function))
+        stdout.write(
+            f"{tstamp}\t{counter}\t{name}\t{onesInReference}\told\t{sid}:{sx}:{sy}\t"
+            + self.baformat(reference, f"\t{flips}\n") +
+            f"{tstamp}\t{counter}\t{name}\t{self.onesInBytes(lastRead)}\tnew\t{sid}:{sx}:{sy}\t"
+            + self.baformat(lastRead, f"\t{flips}\n"))
+        stdout.flush()
+        if update is None:
+            return False
+        for u in update:
+            await self.__runIO(u)
+            if self.DEBUG is True:
+                print("! updating at", counter, u, )
+        return True
     
     async def __hitSimulator(self):
         # not used for now. optional simulation of bit flips was moved to read()
         while self.bitFlipFound is not True:
             interval=random.randrange(1,10)
             await asyncio.sleep(interval/1000)
-            randAddr = random.randrange(0,len(self.simRegs))
-            randReg = random.randrange(0,len(self.simRegs[0]))
-            self.simRegs[randAddr][randReg]=[0xff,0xff]
+            # random byte of all 256*256*2 = 2**17, set its whole register
+            idx = random.getrandbits(17)
+            self.simRegs[idx] = 0xff
+            self.simRegs[idx^1] = 0xff
     
     def updateRegs(self):
         # helper function to update several registers at once for runBitFlipSearch() 
@@ -420,22 +686,21 @@ class Msis1:
 
     def baprint(self,byteArray):
         # nice hexlified printing of binary arrays
+        stdout.write(self.baformat(byteArray))
+
+    def baformat(self,byteArray,end="\t\n"):
+        # string for baprint(), one line per array, terminated by end
         if not isinstance(byteArray, (tuple, list)):
            byteArray=[byteArray]
-        for array in byteArray:
-            print(binascii.hexlify(array, b' '),end="")
-            print("\t")
+        return ''.join(repr(binascii.hexlify(array, b' ')) + end for array in byteArray)
             
     def tstr(self,t):
         # format timestamp string
-        return str(t[3]).zfill(2) +':'+ str(t[4]).zfill(2)+':'+str(t[5]).zfill(2) +' '+ str(t[0]) +'/'+ str(t[1]).zfill(2) +'/'+ str(t[2]).zfill(2) 
+        return time.strftime('%H:%M:%S %Y/%m/%d', t)
         
     def onesInBytes(self,buf):
         # sum-up number of bits set to 1 in buf[] bytes
-        counter=0
-        for byte in buf:
-            counter += self.bitcounts[byte]
-        return counter
+        return _popcount(int.from_bytes(buf,'little'))
 
     # def loadChipConf(self,file=None):
     # FIXME: needs a re-write if needed at all...
@@ -472,6 +737,47 @@ class Msis1:
     #         self.chipwrite(self.getCmdByte("WR"),pattern)
     #     return 49
             
+class RegisterDict(dict):
+    # ordered dict of register name -> value, used for Msis1.GenConf & Msis1.DAC
+    # keeps its byte array representation until one of the values is changed
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes = None
+
+    def __setitem__(self, key, value):
+        self.bytes = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.bytes = None
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self.bytes = None
+        super().update(*args, **kwargs)
+
+    def __ior__(self, other):
+        # dict |= is only available as of python 3.9
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        self.bytes = None
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self.bytes = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self.bytes = None
+        return super().popitem()
+
+    def clear(self):
+        self.bytes = None
+        super().clear()
+
 class MicrobeamSubscriberSocket:
     # reads current beam position over TCP for SEE/pencil beam scans
     # only required for runBitFlipSearch()
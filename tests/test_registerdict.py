@@ -0,0 +1,50 @@
+# checks that register dictionaries never write stale cached bytes,
+# run from the repository root: python -m unittest discover tests
+
+import unittest
+from mimosis import mimosis
+
+class RegisterDictTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m = mimosis.Msis1(sim=True)
+        # fill cache
+        self.m.writeGenConf()
+
+    def assertWritten(self):
+        self.m.writeGenConf()
+        self.assertEqual(self.m.readGenConf(), self.m.getBytesFromDict(self.m.GenConf))
+
+    def test_setitem(self):
+        self.m.GenConf['TRIMDAC'] = 0x22
+        self.assertWritten()
+
+    def test_update(self):
+        self.m.GenConf.update(TRIMDAC=0x22)
+        self.assertWritten()
+
+    def test_ior(self):
+        self.m.GenConf |= {'TRIMDAC': 0x22}
+        self.assertIsInstance(self.m.GenConf, mimosis.RegisterDict)
+        self.assertWritten()
+
+    def test_pop_reinsert(self):
+        value = self.m.GenConf.pop('MONPWR')
+        self.assertEqual(len(self.m.getRegBytes(self.m.GenConf)), 15)
+        self.m.GenConf['MONPWR'] = value ^ 0xff
+        self.assertWritten()
+
+    def test_popitem_setdefault(self):
+        key, value = self.m.GenConf.popitem()
+        self.assertEqual(len(self.m.getRegBytes(self.m.GenConf)), 15)
+        self.m.GenConf.setdefault(key, value ^ 0xff)
+        self.assertWritten()
+
+    def test_delitem_clear(self):
+        del self.m.GenConf['MONPWR']
+        self.assertEqual(len(self.m.getRegBytes(self.m.GenConf)), 15)
+        self.m.GenConf.clear()
+        self.assertEqual(len(self.m.getRegBytes(self.m.GenConf)), 0)
+
+if __name__ == '__main__':
+    unittest.main()